@@ -5,10 +5,47 @@
 
 import re
 import sys
+from typing import Callable, Final
 
 from modules.error import ERR_OPCODE, ERR_OTHER
 from modules.stats import Stats
 
+# Patterns are compiled once and only their bound methods are used,
+# fullmatch() anchors them, so they don't need ^ and $
+_VAR_NAME = r"[a-zA-Z_\-$&%*!?][a-zA-Z0-9_\-$&%*!?]*"
+_LABEL_RE = re.compile(_VAR_NAME)
+_VAR_RE = re.compile(r"(?:GF|LF|TF)@" + _VAR_NAME)
+
+_LABEL_MATCH: Final = _LABEL_RE.fullmatch
+_VAR_MATCH: Final = _VAR_RE.fullmatch
+
+_DEC_DIGITS: Final = "0123456789"
+_HEXA_DIGITS: Final = _DEC_DIGITS + "abcdefABCDEF"
+_OCTAL_DIGITS: Final = "01234567"
+# Lowercased value -> shared literal
+_BOOL_LITERALS: Final = {"true": "true", "false": "false"}
+_TYPES: Final = frozenset(("int", "string", "bool"))
+
+
+def _valid_int(number: str) -> bool:
+    """
+    Check integer literal using string methods only
+
+    int ::= [+-]?[0-9]+ | -?0x[0-9a-fA-F]+ | -?0o?[0-7]+
+    """
+    unsigned = number[1:] if number[:1] in ("+", "-") else number
+    if unsigned[:2] == "0x":
+        digits, allowed = unsigned[2:], _HEXA_DIGITS
+    elif unsigned[:2] == "0o":
+        digits, allowed = unsigned[2:], _OCTAL_DIGITS
+    else:
+        digits, allowed = unsigned, _DEC_DIGITS
+    # Stripping allowed characters leaves nothing if the digits are valid
+    if not digits or digits.strip(allowed):
+        return False
+    # Only decimal numbers can have an explicit plus sign
+    return number[0] != "+" or allowed is _DEC_DIGITS
+
 
 class InstructionArgumentError(Exception):
     pass
@@ -18,515 +55,295 @@ class InstructionBadArgumentCountError(Exception):
     pass
 
 
-class InstructionPattern:
-
-    var_name = r"([a-zA-Z_\-$&%*!?][a-zA-Z0-9_\-$&%*!?]*)$"
-    __dec = r"^[-+]?[0-9]+$"
-    # __dec = r"^[+-]?[0-9]+(?!\S)$"
-    __hexa = r"^-?0x[0-9a-fA-F]+$"
-    __octal = r"^-?0o?[0-7]+$"
-    number = re.compile(r"(" + __dec + r"|" + __hexa + r"|" + __octal + r")")
-    label = re.compile(r"^" + var_name)
-    const = re.compile(r"^(int|bool|string|nil)@(.*)$")
-    var = re.compile(r"^(GF|LF|TF)@" + var_name)
-    backslash = re.compile(r"\\")
-    escape = re.compile(backslash.pattern + r"[0-9]{3}")
-    opcode = re.compile("^[a-zA-Z0-9]+$")
-
+Argument = tuple[str, str]
+Validator = Callable[[str], Argument]
+Handler = Callable[[list[str]], tuple[Argument, ...]]
 
-class Instruction:
 
-    pattern = InstructionPattern()
+# ARGUMENT VALIDATORS
 
-    def var(self, arg: str) -> tuple[str, str]:
-        """
-        <var> ::= var
-        """
-        if (self.pattern.var.match(arg)):
-            return "var", arg
-        else:
-            raise InstructionArgumentError
-
-    def symb(self, arg: str) -> tuple[str, str]:
-        """
-        <symb> ::= <var> | <const>
-        """
-        if (self.pattern.var.match(arg)):
-            return "var", arg
-        elif (match := self.pattern.const.match(arg)):
-            match match.group(1):
-                case "nil":
-                    if match.group(2) == "nil":
-                        return match.group(1), match.group(2)
-                case "int":
-                    if self.pattern.number.match(match.group(2)):
-                        return match.group(1), match.group(2)
-                case "bool":
-                    if match.group(2).lower() in ["true", "false"]:
-                        return match.group(1), match.group(2).lower()
-                case "string":
-                    string = match.group(2)
-                    # For each backslash present
-                    for escape in self.pattern.backslash.finditer(string):
-                        # Check if it's a valid escape sequence
-                        if not self.pattern.escape.match(
-                            string[escape.start():]
-                        ):
-                            raise InstructionArgumentError
-                    return match.group(1), match.group(2)
+def _var(arg: str) -> Argument:
+    """
+    <var> ::= var
+    """
+    if (_VAR_MATCH(arg)):
+        return "var", arg
+    else:
         raise InstructionArgumentError
 
-    def label(self, arg: str) -> tuple[str, str]:
-        """
-        <label> ::= label
-        """
-        if (match := self.pattern.label.match(arg)):
-            return "label", match.group(0)
-        else:
-            raise InstructionArgumentError
-
-    def type(self, arg: str) -> tuple[str, str]:
-        """
-        <type> ::= int | string | bool
-        """
-        if arg in ["int", "string", "bool"]:
-            return "type", arg
-        else:
-            raise InstructionArgumentError
-
-    def jump(self, label: str) -> None:
-        self.stats.jumps += 1
-        if label in self.stats.defined_labels:
-            self.stats.backjumps += 1
-        else:
-            self.stats.unresolved_labels.append(label)
-
-    # INSTRUCTION DEFINITIONS
-
-    def MOVE(self, args: list[str]):
-        """
-        MOVE <var> <symb>
-        """
-        if len(args) != 2:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb = self.symb(args[1])
-
-        return [var, symb]
-
-    def CREATEFRAME(self, args: list[str]):
-        """
-        CREATEFRAME
-        """
-        if args:
-            raise InstructionBadArgumentCountError
-
-    def PUSHFRAME(self, args: list[str]):
-        """
-        PUSHFRAME
-        """
-        if args:
-            raise InstructionBadArgumentCountError
-
-    def POPFRAME(self, args: list[str]):
-        """
-        POPFRAME
-        """
-        if args:
-            raise InstructionBadArgumentCountError
-
-    def DEFVAR(self, args: list[str]):
-        """
-        DEFVAR <var>
-        """
-        if len(args) != 1:
-            raise InstructionBadArgumentCountError
-
-        return [self.var(args[0])]
-
-    def CALL(self, args: list[str]):
-        """
-        CALL <label>
-        """
-        if len(args) != 1:
-            raise InstructionBadArgumentCountError
-
-        label = self.label(args[0])
-        self.jump(label)
-
-        return [self.label(args[0])]
-
-    def RETURN(self, args: list[str]):
-        """
-        RETURN
-        """
-        if args:
-            raise InstructionBadArgumentCountError
-
-        self.stats.jumps += 1
-
-    def PUSHS(self, args: list[str]):
-        """
-        PUSHS <symb>
-        """
-        if len(args) != 1:
-            raise InstructionBadArgumentCountError
-
-        return [self.symb(args[0])]
-
-    def POPS(self, args: list[str]):
-        """
-        POPS <var>
-        """
-        if len(args) != 1:
-            raise InstructionBadArgumentCountError
-
-        return [self.var(args[0])]
-
-    def ADD(self, args: list[str]):
-        """
-        ADD <var> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
-
-        return [var, symb1, symb2]
-
-    def SUB(self, args: list[str]):
-        """
-        SUB <var> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
-
-        return [var, symb1, symb2]
-
-    def MUL(self, args: list[str]):
-        """
-        MUL <var> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
-
-        return [var, symb1, symb2]
-
-    def IDIV(self, args: list[str]):
-        """
-        IDIV <var> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
-
-        return [var, symb1, symb2]
-
-    def LT(self, args: list[str]):
-        """
-        LT <var> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
-
-        return [var, symb1, symb2]
-
-    def GT(self, args: list[str]):
-        """
-        GT <var> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
-
-        return [var, symb1, symb2]
 
-    def EQ(self, args: list[str]):
-        """
-        EQ <var> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
-
-        return [var, symb1, symb2]
-
-    def AND(self, args: list[str]):
-        """
-        AND <var> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
-
-        return [var, symb1, symb2]
-
-    def OR(self, args: list[str]):
-        """
-        OR <var> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
-
-        return [var, symb1, symb2]
-
-    def NOT(self, args: list[str]):
-        """
-        NOT <var> <symb>
-        """
-        if len(args) != 2:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb1 = self.symb(args[1])
-
-        return [var, symb1]
-
-    def INT2CHAR(self, args: list[str]):
-        """
-        INT2CHAR <var> <symb>
-        """
-        if len(args) != 2:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb = self.symb(args[1])
-
-        return [var, symb]
-
-    def STRI2INT(self, args: list[str]):
-        """
-        STRI2INT <var> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
-
-        return [var, symb1, symb2]
-
-    def READ(self, args: list[str]):
-        """
-        READ <var> <type>
-        """
-        if len(args) != 2:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        type = self.type(args[1])
-
-        return [var, type]
-
-    def WRITE(self, args: list[str]):
-        """
-        WRITE <symb>
-        """
-        if len(args) != 1:
-            raise InstructionBadArgumentCountError
-
-        return [self.symb(args[0])]
-
-    def CONCAT(self, args: list[str]):
-        """
-        CONCAT <var> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
-
-        return [var, symb1, symb2]
-
-    def STRLEN(self, args: list[str]):
-        """
-        STRLEN <var> <symb>
-        """
-        if len(args) != 2:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb = self.symb(args[1])
-
-        return [var, symb]
-
-    def GETCHAR(self, args: list[str]):
-        """
-        GETCHAR <var> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
-
-        var = self.var(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
-
-        return [var, symb1, symb2]
+def _symb(arg: str) -> Argument:
+    """
+    <symb> ::= <var> | <const>
+    """
+    if (_VAR_MATCH(arg)):
+        return "var", arg
+    # <const> ::= type@value, the value can contain another "@"
+    # return the type as a literal, which is shared by all arguments,
+    # instead of the freshly split string
+    kind, at, value = arg.partition("@")
+    if at:
+        match kind:
+            case "nil":
+                if value == "nil":
+                    return "nil", "nil"
+            case "int":
+                if _valid_int(value):
+                    return "int", value
+            case "bool":
+                if (literal := _BOOL_LITERALS.get(value.lower())):
+                    return "bool", literal
+            case "string":
+                # Each backslash has to start an escape sequence \ddd
+                escape = value.find("\\")
+                while escape != -1:
+                    code = value[escape + 1:escape + 4]
+                    if len(code) != 3 or code.strip(_DEC_DIGITS):
+                        raise InstructionArgumentError
+                    escape = value.find("\\", escape + 4)
+                return "string", value
+    raise InstructionArgumentError
+
+
+def _label(arg: str) -> Argument:
+    """
+    <label> ::= label
+    """
+    if _LABEL_MATCH(arg):
+        return "label", arg
+    else:
+        raise InstructionArgumentError
 
-    def SETCHAR(self, args: list[str]):
-        """
-        SETCHAR <var> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
 
-        var = self.var(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
+def _type(arg: str) -> Argument:
+    """
+    <type> ::= int | string | bool
+    """
+    if arg in _TYPES:
+        return "type", arg
+    else:
+        raise InstructionArgumentError
 
-        return [var, symb1, symb2]
 
-    def TYPE(self, args: list[str]):
-        """
-        TYPE <var> <symb>
-        """
-        if len(args) != 2:
-            raise InstructionBadArgumentCountError
+# INSTRUCTION DEFINITIONS
+
+# Opcode -> validators of its arguments, in order
+_SIGS: Final[dict[str, tuple[Validator, ...]]] = {
+    # Frames, function calls
+    "MOVE": (_var, _symb),
+    "CREATEFRAME": (),
+    "PUSHFRAME": (),
+    "POPFRAME": (),
+    "DEFVAR": (_var,),
+    "CALL": (_label,),
+    "RETURN": (),
+    # Data stack
+    "PUSHS": (_symb,),
+    "POPS": (_var,),
+    # Arithmetic, relational, boolean and conversion
+    "ADD": (_var, _symb, _symb),
+    "SUB": (_var, _symb, _symb),
+    "MUL": (_var, _symb, _symb),
+    "IDIV": (_var, _symb, _symb),
+    "LT": (_var, _symb, _symb),
+    "GT": (_var, _symb, _symb),
+    "EQ": (_var, _symb, _symb),
+    "AND": (_var, _symb, _symb),
+    "OR": (_var, _symb, _symb),
+    "NOT": (_var, _symb),
+    "INT2CHAR": (_var, _symb),
+    "STRI2INT": (_var, _symb, _symb),
+    # Input/output
+    "READ": (_var, _type),
+    "WRITE": (_symb,),
+    # Strings
+    "CONCAT": (_var, _symb, _symb),
+    "STRLEN": (_var, _symb),
+    "GETCHAR": (_var, _symb, _symb),
+    "SETCHAR": (_var, _symb, _symb),
+    # Types
+    "TYPE": (_var, _symb),
+    # Program flow
+    "LABEL": (_label,),
+    "JUMP": (_label,),
+    "JUMPIFEQ": (_label, _symb, _symb),
+    "JUMPIFNEQ": (_label, _symb, _symb),
+    "EXIT": (_symb,),
+    # Debugging
+    "DPRINT": (_symb,),
+    "BREAK": (),
+}
+
+# INSTRUCTION DEFINITIONS END
+
+
+def _make_handler(sig: tuple[Validator, ...]) -> Handler:
+    """
+    Build a handler specialized for the signature
+
+    the argument count is a constant and the validators are called
+    directly, without looping over the signature for each instruction
+    """
+    match sig:
+        case ():
+            def handler(args: list[str]) -> tuple[Argument, ...]:
+                if args:
+                    raise InstructionBadArgumentCountError
+                return ()
+        case (first,):
+            def handler(args: list[str]) -> tuple[Argument, ...]:
+                if len(args) != 1:
+                    raise InstructionBadArgumentCountError
+                return (first(args[0]),)
+        case (first, second):
+            def handler(args: list[str]) -> tuple[Argument, ...]:
+                if len(args) != 2:
+                    raise InstructionBadArgumentCountError
+                return first(args[0]), second(args[1])
+        case (first, second, third):
+            def handler(args: list[str]) -> tuple[Argument, ...]:
+                if len(args) != 3:
+                    raise InstructionBadArgumentCountError
+                return first(args[0]), second(args[1]), third(args[2])
+        case _:
+            raise ValueError(sig)
+    return handler
+
+
+# Opcode -> handler validating its arguments
+_DISPATCH: Final = {
+    opcode: _make_handler(sig) for opcode, sig in _SIGS.items()
+}
+
+
+# TRUSTED ARGUMENT PARSERS
+# Only split the arguments, the input is expected to be well-formed,
+# the types still have to be known ones, as they are written into XML
+# attributes unescaped
+
+def _trusted_var(arg: str) -> Argument:
+    return "var", arg
+
+
+def _trusted_symb(arg: str) -> Argument:
+    kind, _, value = arg.partition("@")
+    match kind:
+        case "GF" | "LF" | "TF":
+            return "var", arg
+        case "bool":
+            # Output the same literal as the validated bool
+            return "bool", value.lower()
+        case "int" | "string" | "nil":
+            return kind, value
+    raise InstructionArgumentError
 
-        var = self.var(args[0])
-        symb = self.symb(args[1])
 
-        return [var, symb]
+def _trusted_label(arg: str) -> Argument:
+    return "label", arg
 
-    def LABEL(self, args: list[str]):
-        """
-        LABEL <label>
-        """
-        if len(args) != 1:
-            raise InstructionBadArgumentCountError
-
-        label = self.label(args[0])
-        if label not in self.stats.defined_labels:
-            self.stats.defined_labels.add(label)
-            self.stats.labels += 1
-            if label in self.stats.unresolved_labels:
-                self.stats.fwjumps += \
-                    self.stats.unresolved_labels.count(label)
-                self.stats.unresolved_labels = list(
-                    filter((label).__ne__, self.stats.unresolved_labels)
-                )
 
-        return [label]
+def _trusted_type(arg: str) -> Argument:
+    if arg in _TYPES:
+        return "type", arg
+    else:
+        raise InstructionArgumentError
 
-    def JUMP(self, args: list[str]):
-        """
-        JUMP <label>
-        """
-        if len(args) != 1:
-            raise InstructionBadArgumentCountError
 
-        label = self.label(args[0])
-        self.jump(label)
+_TRUSTED: Final[dict[Validator, Validator]] = {
+    _var: _trusted_var,
+    _symb: _trusted_symb,
+    _label: _trusted_label,
+    _type: _trusted_type,
+}
 
-        return [label]
+# Opcode -> handler only checking the count of its arguments
+_TRUSTED_DISPATCH: Final = {
+    opcode: _make_handler(tuple(_TRUSTED[validate] for validate in sig))
+    for opcode, sig in _SIGS.items()
+}
 
-    def JUMPIFEQ(self, args: list[str]):
-        """
-        JUMPIFEQ <label> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
 
-        label = self.label(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
-        self.jump(label)
+# STATISTICS HOOKS
 
-        return [label, symb1, symb2]
+def _handle_jump(args: tuple[Argument, ...], stats: Stats) -> None:
+    """
+    Count a jump to the label in the first argument
+    """
+    stats.jumps += 1
+    if args[0] in stats.defined_labels:
+        stats.backjumps += 1
+    else:
+        stats.unresolved_labels[args[0]] += 1
 
-    def JUMPIFNEQ(self, args: list[str]):
-        """
-        JUMPIFNEQ <label> <symb> <symb>
-        """
-        if len(args) != 3:
-            raise InstructionBadArgumentCountError
 
-        label = self.label(args[0])
-        symb1 = self.symb(args[1])
-        symb2 = self.symb(args[2])
-        self.jump(label)
+def _handle_return(args: tuple[Argument, ...], stats: Stats) -> None:
+    """
+    Count a return as a jump
+    """
+    stats.jumps += 1
 
-        return [label, symb1, symb2]
 
-    def EXIT(self, args: list[str]):
-        """
-        EXIT <symb>
-        """
-        if len(args) != 1:
-            raise InstructionBadArgumentCountError
+def _handle_label(args: tuple[Argument, ...], stats: Stats) -> None:
+    """
+    Define the label in the first argument and resolve jumps to it
+    """
+    label = args[0]
+    if label not in stats.defined_labels:
+        stats.defined_labels.add(label)
+        stats.labels += 1
+        stats.fwjumps += stats.unresolved_labels.pop(label, 0)
 
-        return [self.symb(args[0])]
 
-    def DPRINT(self, args: list[str]):
-        """
-        DPRINT <symb>
-        """
-        if len(args) != 1:
-            raise InstructionBadArgumentCountError
+# Opcodes affecting the label and jump statistics
+_HOOKS: Final[dict[str, Callable[[tuple[Argument, ...], Stats], None]]] = {
+    "CALL": _handle_jump,
+    "RETURN": _handle_return,
+    "LABEL": _handle_label,
+    "JUMP": _handle_jump,
+    "JUMPIFEQ": _handle_jump,
+    "JUMPIFNEQ": _handle_jump,
+}
+_UPPER_CACHE: dict[str, str] = {}
 
-        return [self.symb(args[0])]
 
-    def BREAK(self, args: list[str]):
-        """
-        BREAK
-        """
-        if args:
-            raise InstructionBadArgumentCountError
+class Instruction:
 
-    # INSTRUCTION DEFINITIONS END
+    # Programs can have lots of instructions, avoid a __dict__ for each
+    __slots__ = ("opcode", "args")
+    _dispatch = _DISPATCH
 
     def __init__(self, opcode: str, args: list[str], stats: Stats) -> None:
         """
         Try to build an instruction from opcode and arguments
+
+        stats are updated, but not kept in the instruction
         """
-        self.stats = stats
-        try:
-            if not self.pattern.opcode.match(opcode):
+        # Opcodes repeat a lot, so remember their uppercase variants,
+        # non-ASCII opcodes can uppercase to a known one ("puſhs"),
+        # so they're mapped to nothing and fail the lookup below
+        if (upper := _UPPER_CACHE.get(opcode)) is None:
+            upper = _UPPER_CACHE[opcode] = (
+                opcode.upper() if opcode.isascii() else ""
+                )
+        if (handler := self._dispatch.get(upper)) is None:
+            # Only check the opcode format when it's not a known one
+            if not (opcode.isascii() and opcode.isalnum()):
                 sys.exit(ERR_OTHER)
-            self.args = getattr(self, opcode.upper())(args)
-            self.opcode = opcode.upper()
-            try:
-                self.stats.opcodes[self.opcode] += 1
-            except KeyError:
-                self.stats.opcodes[self.opcode] = 1
-        except AttributeError:
             sys.exit(ERR_OPCODE)
+        try:
+            self.args = handler(args)
         except (InstructionArgumentError, InstructionBadArgumentCountError):
             sys.exit(ERR_OTHER)
+        if (hook := _HOOKS.get(upper)):
+            hook(self.args, stats)
+        self.opcode = upper
+        stats.opcodes[upper] += 1
+
+
+class TrustedInstruction(Instruction):
+    """
+    Instruction from trusted input, the arguments are not validated
+    """
 
-    def __str__(self) -> str:
-        return f"{self.opcode} {self.args}"
+    __slots__ = ()
+    _dispatch = _TRUSTED_DISPATCH
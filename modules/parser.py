@@ -4,10 +4,10 @@
 # @brief Parser module for IPPcode24
 
 import sys
-from typing import Optional, TextIO
+from typing import BinaryIO, Iterator, Optional, TextIO
 
 from modules.error import ERR_HEADER
-from modules.instruction import Instruction
+from modules.instruction import Instruction, TrustedInstruction
 from modules.stats import Stats
 
 IPPCODE_NAME = "IPPcode24"
@@ -15,46 +15,79 @@ IPPCODE_NAME = "IPPcode24"
 
 class IPPcodeParser:
 
-    def __init__(self, stream: TextIO = sys.stdin) -> None:
-        self.stream = stream
-        self.instruction_list = []
+    def __init__(
+            self,
+            stream: BinaryIO | TextIO | None = None,
+            trusted: bool = False
+            ) -> None:
+        # Look up stdin on use, it can be replaced after the import
+        self.stream = sys.stdin.buffer if stream is None else stream
+        # Skip the argument validation for trusted input
+        self.instruction = TrustedInstruction if trusted else Instruction
+        self.lines: Iterator[str] = iter(())
+        self.instruction_list: list[Instruction] = []
         self.stats = Stats()
         pass
 
     def nextline(self) -> Optional[str]:
         """
-        Read next non-empty line from stream and strip it from `' '` and
-        `'\\t'`
+        Read next non-empty line from input and strip it from whitespace
 
         non-empty contains anything else than whitespace and comment
         """
-        for line in self.stream:
+        for line in self.lines:
             if (comment_start := line.find("#")) != -1:  # Remove comments
                 self.stats.comments += 1
                 line = line[:comment_start]
-            line = line.strip(" \t\n")  # Remove whitespace around
+            # Remove whitespace around, only spaces and tabs separate
+            # the parts, CR of CRLF line endings is dropped too
+            line = line.strip(" \t\r")
             if line:  # If still not empty, return
                 return line
+        return None
 
     def check_header(self) -> None:
         """
         Check header of the input stream
         """
-        try:
-            if self.nextline().lower() != "." + IPPCODE_NAME.lower():
-                sys.exit(ERR_HEADER)
-        # Stream contains only whitespace
-        except AttributeError:
+        header = self.nextline()
+        # Stream can contain only whitespace
+        if header is None or header.lower() != "." + IPPCODE_NAME.lower():
             sys.exit(ERR_HEADER)
 
     def parse_instruction(self, line: str) -> Instruction:
         """
         Parse instruction from line
         """
-        opcode, *args = [part for part
-                         in line.replace('\t', ' ').split(' ')
-                         if part]
-        return Instruction(opcode, args, self.stats)
+        parts = line.replace("\t", " ").split(" ")
+        # Only filter out the empty parts if several separators follow
+        if "" in parts:
+            parts = [part for part in parts if part]
+        opcode, *args = parts
+        return self.instruction(opcode, args, self.stats)
+
+    def parse_iter(self) -> Iterator[Instruction]:
+        """
+        Parse the input file lazily
+
+        for each line, try to parse the instruction and yield it,
+        statistics are complete once all instructions are consumed
+        """
+        # Read the whole input at once and split it into lines in one pass
+        data = self.stream.read()
+        # IPPcode is UTF-8 encoded, decode raw input at once
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        # Break lines only on newlines, as reading stdin line by line does,
+        # splitlines() would also break them on form feeds and others,
+        # a trailing carriage return is stripped with other whitespace
+        self.lines = iter(data.split("\n"))
+        self.check_header()
+        while (line := self.nextline()):
+            instruction = self.parse_instruction(line)
+            self.stats.loc += 1
+            yield instruction
+        self.stats.badjumps = self.stats.unresolved_labels.total()
 
     def parse(self) -> None:
         """
@@ -63,11 +96,7 @@ class IPPcodeParser:
         for each line, try to parse the instruction
         and add it to the list of instructions
         """
-        self.check_header()
-        while (line := self.nextline()):
-            self.instruction_list.append(self.parse_instruction(line))
-            self.stats.loc += 1
-        self.stats.badjumps = len(self.stats.unresolved_labels)
+        self.instruction_list.extend(self.parse_iter())
 
     def get_internal_repr(self) -> list[Instruction]:
         """
@@ -4,10 +4,16 @@
 # @brief Module for gathering and printing statistics
 
 import sys
+from collections import Counter, defaultdict
 from typing import TextIO
 
 from modules.error import ERR_DESTFILE, ERR_PARAM
 
+STAT_NAMES = [
+    "loc", "comments", "labels", "jumps",
+    "fwjumps", "backjumps", "badjumps", "frequent"
+]
+
 
 class Stats:
     def __init__(self) -> None:
@@ -18,9 +24,9 @@ class Stats:
         self.fwjumps = 0
         self.backjumps = 0
         self.badjumps = 0
-        self.opcodes = {}
-        self.defined_labels = set()
-        self.unresolved_labels = list()
+        self.opcodes: defaultdict[str, int] = defaultdict(int)
+        self.defined_labels: set[tuple[str, str]] = set()
+        self.unresolved_labels: Counter[tuple[str, str]] = Counter()
 
 
 class UnexpectedArgumentError(Exception):
@@ -32,9 +38,10 @@ class StatsFileUsedTwiceError(Exception):
 
 
 class ArgParser:
-    def __init__(self, args=None) -> None:
+    def __init__(self, args: list[str] | None = None) -> None:
         self.argv = args or sys.argv[1:]
-        self.used_files = []
+        self.used_files: list[str] = []
+        self.groups: list[tuple[TextIO, list[str]]] = []
 
     def print_help(self) -> None:
         if len(self.argv) > 1:
@@ -42,38 +49,29 @@ class ArgParser:
         print("Usage: parse.py")
         sys.exit(0)
 
-    def __print_stat(self, stat_name: str, file: TextIO) -> bool:
-        if stat_name in [
-            "loc", "comments", "labels", "jumps",
-            "fwjumps", "backjumps", "badjumps"
-        ]:
-            file.write(f"{getattr(self.stats, stat_name)}\n")
-            return True
+    def __print_stat(self, stat_name: str, file: TextIO) -> None:
+        if stat_name.startswith("print="):
+            string = stat_name.removeprefix("print=")
+            file.write(f"{string}\n")
+        elif stat_name == "eol":
+            file.write("\n")
         elif stat_name == "frequent":
             if self.stats.opcodes:
-                # Sort by frequency
-                opcodes_by_freq = sorted(
-                    self.stats.opcodes.items(),
-                    key=lambda x: x[1],
-                    reverse=True)
                 # Find the most frequent ones (can be more than one)
-                most_freq = max(opcodes_by_freq, key=lambda x: x[1])[1]
-                most_freq = [
-                            opcode for opcode, _
-                            in opcodes_by_freq
-                            if _ == most_freq
-                ]
+                max_count = 0
+                most_freq = []
+                for opcode, count in self.stats.opcodes.items():
+                    if count > max_count:
+                        max_count = count
+                        most_freq = [opcode]
+                    elif count == max_count:
+                        most_freq.append(opcode)
                 most_freq.sort()
-                # The last element cannot contain a comma
-                file.write(f"{most_freq[0]}")
-                for opcode in most_freq[1:]:
-                    file.write(f",{opcode}")
-                file.write("\n")
-            return True
+                file.write(",".join(most_freq) + "\n")
         else:
-            return False
+            file.write(f"{getattr(self.stats, stat_name)}\n")
 
-    def __print_stats_group(self) -> None:
+    def __parse_stats_group(self) -> tuple[str, list[str]]:
         grp_prefix = "--stats="
         if self.argv[0].startswith(grp_prefix):
             file = self.argv[0].removeprefix(grp_prefix)
@@ -81,20 +79,18 @@ class ArgParser:
                 raise StatsFileUsedTwiceError
             self.used_files.append(file)
             self.argv = self.argv[1:]
-            with open(file, "w") as file:
-                while self.argv and not self.argv[0].startswith(grp_prefix):
-                    arg_prefix = "--"
-                    if not self.argv[0].startswith(arg_prefix):
-                        raise UnexpectedArgumentError
-                    argname = self.argv[0].removeprefix(arg_prefix)
-                    if argname.startswith("print="):
-                        string = argname.removeprefix("print=")
-                        file.write(f"{string}\n")
-                    elif argname == "eol":
-                        file.write("\n")
-                    elif not self.__print_stat(argname, file):
-                        raise UnexpectedArgumentError
-                    self.argv = self.argv[1:]
+            stat_names = []
+            while self.argv and not self.argv[0].startswith(grp_prefix):
+                arg_prefix = "--"
+                if not self.argv[0].startswith(arg_prefix):
+                    raise UnexpectedArgumentError
+                argname = self.argv[0].removeprefix(arg_prefix)
+                if not (argname.startswith("print=") or argname == "eol"
+                        or argname in STAT_NAMES):
+                    raise UnexpectedArgumentError
+                stat_names.append(argname)
+                self.argv = self.argv[1:]
+            return file, stat_names
         else:
             raise UnexpectedArgumentError
 
@@ -102,12 +98,36 @@ class ArgParser:
         if set(self.argv).intersection(["--help", "-h"]):
             self.print_help()
 
-    def print_stats(self, stats: Stats) -> None:
-        self.stats = stats
+    def handle_fast(self) -> bool:
+        if "--fast" not in self.argv:
+            return False
+        self.argv = [arg for arg in self.argv if arg != "--fast"]
+        return True
+
+    def handle_stats(self) -> None:
+        """
+        Check statistics arguments and open their files before anything
+        is parsed or written, they are printed only after the whole input
+        is processed
+        """
+        parsed_groups = []
         while self.argv:
             try:
-                self.__print_stats_group()
+                parsed_groups.append(self.__parse_stats_group())
             except UnexpectedArgumentError:
                 sys.exit(ERR_PARAM)
             except StatsFileUsedTwiceError:
                 sys.exit(ERR_DESTFILE)
+        # Open the files only when all arguments are valid
+        for file, stat_names in parsed_groups:
+            try:
+                self.groups.append((open(file, "w"), stat_names))
+            except OSError:
+                sys.exit(ERR_DESTFILE)
+
+    def print_stats(self, stats: Stats) -> None:
+        self.stats = stats
+        for stats_file, stat_names in self.groups:
+            with stats_file:
+                for stat_name in stat_names:
+                    self.__print_stat(stat_name, stats_file)
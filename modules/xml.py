@@ -3,8 +3,9 @@
 # @author Lukas Tesar <xtesar43@stud.fit.vutbr.cz>
 # @brief Module for building XML from internal representation
 
-from typing import TextIO
-from xml.etree import ElementTree
+from itertools import chain
+from typing import BinaryIO, Iterable
+from xml.sax.saxutils import escape
 
 from modules.instruction import Instruction
 from modules.parser import IPPCODE_NAME
@@ -14,63 +15,64 @@ class XMLBuilder:
 
     def __init__(self, indent_width: int = 4) -> None:
         """
-        Initialize XMLBuilder with "program" root element
+        Initialize XMLBuilder writing instructions into "program" element
         """
-        self.program = ElementTree.Element(
-            "program",
-            attrib={"language": IPPCODE_NAME}
-            )
-        self.order = 0
         self.indent_width = indent_width
-
-    def get_instruction_order(self) -> int:
-        """"
-        Return order of the next instruction
-        """
-        self.order += 1
-        return self.order
+        self.indent = " " * indent_width
 
     def build_instruction(
             self,
+            order: int,
             opcode: str,
-            args: list[tuple[str, str]]
-            ) -> ElementTree.Element:
+            args: tuple[tuple[str, str], ...]
+            ) -> str:
         """
         Build a single instruction element
-        """
-        instruction = ElementTree.Element(
-            "instruction",
-            attrib={"order": str(self.get_instruction_order()),
-                    "opcode": opcode}
-            )
-        try:
-            for i, arg in enumerate(args, start=1):
-                ElementTree.SubElement(
-                    instruction,
-                    f"arg{i}",
-                    attrib={"type": arg[0]},
-                    ).text = arg[1]
-        except TypeError:
-            pass
-        return instruction
 
-    def build(self, instruction_list: list[Instruction]) -> None:
+        opcodes and argument types are validated identifiers,
+        so only the argument values need to be escaped
         """
-        Build XML from internal representation
-        """
-        for instruction in instruction_list:
-            self.program.append(
-                self.build_instruction(instruction.opcode, instruction.args)
-                )
+        indent = self.indent
+        head = f'{indent}<instruction order="{order}" opcode="{opcode}"'
+        if not args:
+            return f"{head} />\n"
+        parts = [f"{head}>\n"]
+        for i, (arg_type, value) in enumerate(args, start=1):
+            if value:
+                parts.append(f'{indent}{indent}<arg{i} type="{arg_type}">'
+                             f'{escape(value)}</arg{i}>\n')
+            else:
+                parts.append(f'{indent}{indent}<arg{i} type="{arg_type}" />\n')
+        parts.append(f"{indent}</instruction>\n")
+        return "".join(parts)
 
-    def write(self, file: TextIO) -> None:
+    def stream(
+            self,
+            instructions: Iterable[Instruction],
+            file: BinaryIO
+            ) -> None:
         """
-        Write internal XML to a file
+        Write XML built from instructions to a binary file as they come
+
+        instructions are serialized one by one, so neither the whole XML
+        document nor the list of instructions needs to be held in memory
         """
-        ElementTree.indent(self.program, space=" " * self.indent_width)
-        xml = ElementTree.tostring(
-            self.program,
-            encoding="UTF-8",
-            xml_declaration=True
-            ).decode()
-        print(xml, file=file)
+        instructions = iter(instructions)
+        # Take the first instruction before writing anything, so nothing
+        # is written when the header is invalid
+        first = next(instructions, None)
+        file.write(b"<?xml version='1.0' encoding='UTF-8'?>\n")
+        if first is None:
+            file.write(f'<program language="{IPPCODE_NAME}" />\n'.encode())
+            return
+        file.write(f'<program language="{IPPCODE_NAME}">\n'.encode())
+        for order, instruction in enumerate(
+                chain((first,), instructions),
+                start=1
+                ):
+            file.write(self.build_instruction(
+                order,
+                instruction.opcode,
+                instruction.args
+                ).encode())
+        file.write(b"</program>\n")
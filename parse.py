@@ -3,19 +3,25 @@
 # @author Lukas Tesar <xtesar43@stud.fit.vutbr.cz>
 # @brief Main parser file
 
+import os
 import signal
 import sys
+from types import FrameType
 
-from modules.error import ERR_SIGINT
+from modules.error import ERR_INTERNAL, ERR_SIGINT
 from modules.parser import IPPcodeParser
 from modules.stats import ArgParser
 from modules.xml import XMLBuilder
 
+STDOUT_BUFFER_SIZE = 1 << 20
+
 
 # Handle SIGINT (produced by Ctrl+C and raises KeyboardInterrupt)
-# it prints awful traceback everytime
-def sigint_handler(signum, frame):
-    sys.exit(ERR_SIGINT)
+# it prints awful traceback everytime, exit right away without
+# the interpreter cleanup
+def sigint_handler(signum: int, frame: FrameType | None) -> None:
+    sys.stderr.flush()
+    os._exit(ERR_SIGINT)
 
 
 # It can be used as a module or a standalone script
@@ -26,16 +32,29 @@ if __name__ == "__main__":
 
     argparser = ArgParser()
     argparser.handle_help()
+    trusted = argparser.handle_fast()
+    argparser.handle_stats()
+
+    # Parse input, with --fast the arguments are not validated
+    parser = IPPcodeParser(trusted=trusted)
 
-    # Parse input
-    parser = IPPcodeParser()
-    parser.parse()
-    instruction_list = parser.get_internal_repr()
+    # Write XML as the instructions are parsed, as UTF-8 bytes
+    # through a large buffer to save on write calls
+    xml = XMLBuilder()
+    with open(
+            sys.stdout.fileno(), "wb",
+            buffering=STDOUT_BUFFER_SIZE, closefd=False
+            ) as stdout:
+        try:
+            xml.stream(parser.parse_iter(), file=stdout)
+        # Exit without flushing the buffer on an error in the input,
+        # so the partial document is not printed, the output that
+        # has outgrown the buffer is already written though (that's
+        # the cost of streaming, large programs leave truncated XML)
+        except SystemExit as error:
+            code = error.code if isinstance(error.code, int) else ERR_INTERNAL
+            sys.stderr.flush()
+            os._exit(code)
 
     # Print statistics as requested by provided arguments
     argparser.print_stats(parser.get_stats())
-
-    # Build XML from internal representation
-    xml = XMLBuilder()
-    xml.build(instruction_list)
-    xml.write(file=sys.stdout)